@@ -0,0 +1,162 @@
+import math
+import threading
+from collections import deque
+
+# 질문 유형별 생성 정책 설정
+MIN_SAMPLES = 5  # 이력 기반 max_tokens를 적용하기 위한 최소 응답 수
+HISTORY_SIZE = 50  # 질문 유형별로 보관하는 응답 길이 이력 수
+HEADROOM = 1.2  # p95 응답 길이에 더하는 여유분
+MIN_MAX_TOKENS = 200  # 첫 호출 및 남은 상한의 최소 토큰 수
+MAX_CONTINUATIONS = 2  # 응답이 잘렸을 때 이어서 생성하는 최대 횟수
+
+# 프리셋 질문에는 답변 길이를 줄이기 위한 간결성 지시를 덧붙입니다 (프롬프트 자체가 바뀜).
+PRESET_SUFFIX = "\n\nKeep the answer focused."
+# 간결성 지시의 효과를 측정하기 위해 프리셋 답변 N개 중 1개는 지시 없이 생성해 대조군으로 사용
+PRESET_HOLDOUT_EVERY = 5
+
+# 질문 유형별 기본값 (default_max_tokens가 None이면 사용자가 설정한 Max Tokens 사용)
+PROMPT_TYPES = {
+    'create_cluster': {'default_max_tokens': 1200, 'preset': True},
+    'kubectl_commands': {'default_max_tokens': 1000, 'preset': True},
+    'scale_deployment': {'default_max_tokens': 1200, 'preset': True},
+    'connect_rds': {'default_max_tokens': 1200, 'preset': True},
+    'free_form': {'default_max_tokens': None, 'preset': False},
+}
+
+# 프로세스 단위 이력 및 통계 (Streamlit 재실행과 무관하게 유지됨)
+_lock = threading.Lock()
+_history = {}
+_stats = {}
+_plans = {}  # 질문 유형별 plan 호출 수 (대조군 선택용)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, math.ceil(len(ordered) * pct / 100) - 1)
+    return ordered[index]
+
+
+def plan(prompt_type, max_tokens):
+    """질문 유형에 맞는 max_tokens와 프롬프트 접미사(간결성 지시 적용 여부)를 결정합니다.
+
+    사용자가 설정한 max_tokens는 상한으로만 사용합니다.
+    """
+    policy = PROMPT_TYPES.get(prompt_type, PROMPT_TYPES['free_form'])
+
+    with _lock:
+        history = list(_history.get(prompt_type, []))
+        _plans[prompt_type] = _plans.get(prompt_type, 0) + 1
+        suffixed = policy['preset'] and _plans[prompt_type] % PRESET_HOLDOUT_EVERY != 0
+
+    if len(history) >= MIN_SAMPLES:
+        budget = math.ceil(_percentile(history, 95) * HEADROOM / 50) * 50
+    else:
+        budget = policy['default_max_tokens'] or max_tokens
+    budget = min(max(budget, MIN_MAX_TOKENS), max_tokens)
+    # 남는 상한이 너무 작으면 이어 생성해도 쓸모가 없으므로 상한 전체를 요청
+    if max_tokens - budget < MIN_MAX_TOKENS:
+        budget = max_tokens
+
+    return {
+        'max_tokens': budget,
+        'prompt_suffix': PRESET_SUFFIX if suffixed else "",
+        'suffixed': suffixed,
+    }
+
+
+def record(prompt_type, calls, capped=False, suffixed=False):
+    """응답 길이 이력과 생성 통계를 기록합니다.
+
+    calls는 이어 생성을 포함한 Bedrock 호출별 {'max_tokens', 'input_tokens', 'output_tokens', 'latency'} 목록입니다.
+    잘린 응답(capped)은 실제 길이를 알 수 없으므로 이력과 비교 통계에서 제외하고 따로 집계합니다.
+    """
+    first = calls[0]
+    continuations = calls[1:]
+    output_tokens = sum(call['output_tokens'] for call in calls)
+    latency = sum(call['latency'] for call in calls)
+
+    # 이어 생성 오버헤드: 고정 Max Tokens로 한 번에 생성했다면 없었을 입력 토큰과 왕복 지연.
+    # 이어 생성된 출력은 첫 호출의 토큰당 생성 시간으로 만들어졌다고 보고 나머지를 오버헤드로 봅니다.
+    seconds_per_token = first['latency'] / max(first['output_tokens'], 1)
+    continuation_latency = sum(
+        call['latency'] - call['output_tokens'] * seconds_per_token for call in continuations
+    )
+
+    with _lock:
+        stats = _stats.setdefault(prompt_type, {
+            'answers': 0,
+            'requests': 0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'requested_tokens': 0,
+            'latency': 0.0,
+            'capped': 0,
+            'continuation_input_tokens': 0,
+            'continuation_latency': 0.0,
+            'suffixed_answers': 0,
+            'suffixed_output_tokens': 0,
+            'suffixed_latency': 0.0,
+            'plain_answers': 0,
+            'plain_output_tokens': 0,
+            'plain_latency': 0.0,
+        })
+        stats['answers'] += 1
+        stats['requests'] += len(calls)
+        stats['input_tokens'] += sum(call['input_tokens'] for call in calls)
+        stats['output_tokens'] += output_tokens
+        stats['requested_tokens'] += sum(call['max_tokens'] for call in calls)
+        stats['latency'] += latency
+        if capped:
+            stats['capped'] += 1
+            return
+
+        _history.setdefault(prompt_type, deque(maxlen=HISTORY_SIZE)).append(output_tokens)
+        stats['continuation_input_tokens'] += sum(call['input_tokens'] for call in continuations)
+        stats['continuation_latency'] += continuation_latency
+        group = 'suffixed' if suffixed else 'plain'
+        stats[f'{group}_answers'] += 1
+        stats[f'{group}_output_tokens'] += output_tokens
+        stats[f'{group}_latency'] += latency
+
+
+def get_stats():
+    """질문 유형별 생성 통계를 반환합니다.
+
+    continuation_* 값은 고정 Max Tokens 대비 이어 생성으로 추가된 비용(0 이상)이고,
+    suffix_*_delta 값은 간결성 지시를 적용한 답변과 대조군(지시 없음)의 답변당 평균 차이입니다(음수면 절감).
+    """
+    with _lock:
+        snapshot = {prompt_type: dict(stats) for prompt_type, stats in _stats.items()}
+
+    report = {}
+    for prompt_type, stats in snapshot.items():
+        answers = stats['answers']
+        complete = answers - stats['capped']
+
+        suffix_output_delta = suffix_latency_delta = None
+        if stats['suffixed_answers'] and stats['plain_answers']:
+            suffix_output_delta = round(
+                stats['suffixed_output_tokens'] / stats['suffixed_answers']
+                - stats['plain_output_tokens'] / stats['plain_answers']
+            )
+            suffix_latency_delta = round(
+                stats['suffixed_latency'] / stats['suffixed_answers']
+                - stats['plain_latency'] / stats['plain_answers'], 2
+            )
+
+        report[prompt_type] = {
+            'answers': answers,
+            'continuations': stats['requests'] - answers,
+            'capped': stats['capped'],
+            'avg_input_tokens': round(stats['input_tokens'] / answers),
+            'avg_output_tokens': round(stats['output_tokens'] / answers),
+            'avg_max_tokens': round(stats['requested_tokens'] / answers),
+            'avg_latency': round(stats['latency'] / answers, 2),
+            'ms_per_output_token': round(stats['latency'] * 1000 / max(stats['output_tokens'], 1), 1),
+            'continuation_input_tokens': stats['continuation_input_tokens'],
+            'avg_continuation_latency': round(stats['continuation_latency'] / complete, 2) if complete else 0.0,
+            'suffix_samples': (stats['suffixed_answers'], stats['plain_answers']),
+            'suffix_output_delta': suffix_output_delta,
+            'suffix_latency_delta': suffix_latency_delta,
+        }
+    return report
@@ -0,0 +1,172 @@
+import http.client
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 헬스 체크 설정
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', '8502'))
+BEDROCK_MAX_INFLIGHT = int(os.getenv('BEDROCK_MAX_INFLIGHT', '8'))
+STREAMLIT_CHECK_INTERVAL = float(os.getenv('STREAMLIT_CHECK_INTERVAL', '2'))  # Streamlit 서버 확인 주기(초)
+STREAMLIT_CHECK_TIMEOUT = float(os.getenv('STREAMLIT_CHECK_TIMEOUT', '1'))
+STREAMLIT_LIVENESS_TIMEOUT = float(os.getenv('STREAMLIT_LIVENESS_TIMEOUT', '30'))  # 이 시간 동안 응답이 없으면 liveness 실패
+STREAMLIT_STARTUP_GRACE = float(os.getenv('STREAMLIT_STARTUP_GRACE', '120'))  # 첫 응답 전까지 liveness를 통과시키는 시간
+
+# 프로세스 단위 상태 (Streamlit 재실행과 무관하게 유지됨)
+_lock = threading.Lock()
+_started_at = time.time()
+_state = {
+    'aws_clients': None,  # None: 아직 초기화 전, True/False: 초기화 결과
+    'bedrock_inflight': 0,
+    'refreshed_at': {},  # 'models', 'clusters' 등 캐시 항목별 마지막 갱신 시각
+    'streamlit_ok': False,  # 마지막 Streamlit 서버 확인 결과
+    'streamlit_ok_at': None,  # Streamlit 서버가 마지막으로 응답한 시각
+}
+_server = None
+
+
+def mark_aws_clients(initialized):
+    """init_aws_clients 결과를 기록합니다."""
+    with _lock:
+        _state['aws_clients'] = bool(initialized)
+
+
+def mark_refreshed(name):
+    """캐시된 카탈로그/인벤토리의 갱신 시각을 기록합니다."""
+    with _lock:
+        _state['refreshed_at'][name] = time.time()
+
+
+@contextmanager
+def track_bedrock_call():
+    """진행 중인 Bedrock 호출 수를 집계합니다."""
+    with _lock:
+        _state['bedrock_inflight'] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _state['bedrock_inflight'] -= 1
+
+
+def _streamlit_health_path():
+    """Streamlit 서버의 포트와 /_stcore/health 경로를 반환합니다."""
+    try:
+        from streamlit import config
+
+        port = config.get_option('server.port')
+        base_path = (config.get_option('server.baseUrlPath') or '').strip('/')
+    except Exception:
+        port, base_path = 8501, ''
+    return port, f"/{base_path}/_stcore/health" if base_path else "/_stcore/health"
+
+
+def _check_streamlit():
+    """Streamlit 서버의 헬스 엔드포인트를 호출해 Tornado 이벤트 루프가 응답하는지 확인합니다."""
+    port, path = _streamlit_health_path()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=STREAMLIT_CHECK_TIMEOUT)
+    try:
+        conn.request('GET', path)
+        return conn.getresponse().status == 200
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+
+def _watch_streamlit():
+    # 프로브가 Streamlit을 직접 기다리지 않도록 백그라운드에서 주기적으로 확인하고 결과만 저장합니다.
+    while True:
+        ok = _check_streamlit()
+        with _lock:
+            _state['streamlit_ok'] = ok
+            if ok:
+                _state['streamlit_ok_at'] = time.time()
+        time.sleep(STREAMLIT_CHECK_INTERVAL)
+
+
+def get_status():
+    """현재 헬스 상태를 반환합니다. AWS 호출은 하지 않습니다."""
+    # 스크립트 스레드가 상태를 바꾸는 중에 순회하지 않도록 잠금 상태에서 복사
+    with _lock:
+        now = time.time()
+        aws_clients = _state['aws_clients']
+        inflight = _state['bedrock_inflight']
+        refreshed = dict(_state['refreshed_at'])
+        streamlit_ok = _state['streamlit_ok']
+        streamlit_ok_at = _state['streamlit_ok_at']
+    saturated = inflight >= BEDROCK_MAX_INFLIGHT
+
+    # Streamlit이 한 번도 응답하지 않았다면 시작 유예 시간 동안만 살아 있는 것으로 봅니다.
+    if streamlit_ok_at is None:
+        live = now - _started_at < STREAMLIT_STARTUP_GRACE
+    else:
+        live = now - streamlit_ok_at < STREAMLIT_LIVENESS_TIMEOUT
+
+    return {
+        'live': live,
+        'ready': streamlit_ok and not saturated,
+        'uptime_seconds': round(now - _started_at, 1),
+        'streamlit': {
+            'ok': streamlit_ok,
+            'last_ok_age_seconds': None if streamlit_ok_at is None else round(now - streamlit_ok_at, 1),
+        },
+        'aws_clients_initialized': aws_clients,
+        'cache_age_seconds': {
+            name: round(now - refreshed_at, 1)
+            for name, refreshed_at in refreshed.items()
+        },
+        'bedrock': {
+            'inflight': inflight,
+            'max_inflight': BEDROCK_MAX_INFLIGHT,
+            'saturated': saturated,
+        },
+    }
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    """/healthz (liveness), /readyz (readiness) 요청을 처리합니다."""
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/healthz':
+            status = get_status()
+            code = 200 if status['live'] else 503
+        elif path == '/readyz':
+            status = get_status()
+            code = 200 if status['ready'] else 503
+        else:
+            status = {'error': 'not found'}
+            code = 404
+
+        body = json.dumps(status).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 프로브 요청으로 로그가 넘치지 않도록 접근 로그를 남기지 않습니다.
+        pass
+
+
+def start_health_server(port=None):
+    """헬스 체크 서버를 백그라운드 스레드로 시작합니다. 이미 실행 중이면 무시합니다."""
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(('0.0.0.0', port or HEALTH_PORT), _HealthHandler)
+        except OSError as e:
+            # 다른 프로세스가 포트를 사용 중인 경우 앱 자체는 계속 동작하도록 합니다.
+            print(f"헬스 체크 서버를 시작하지 못했습니다: {e}")
+            return None
+        _server.daemon_threads = True
+        thread = threading.Thread(target=_server.serve_forever, name='health-server', daemon=True)
+        thread.start()
+        threading.Thread(target=_watch_streamlit, name='health-streamlit-watch', daemon=True).start()
+        return _server
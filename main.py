@@ -7,6 +7,10 @@ import time
 import os
 from datetime import datetime
 
+import generation
+import health
+import profiling
+
 # 페이지 설정
 st.set_page_config(
     page_title="AWS EKS 클러스터 관리 어시스턴트",
@@ -15,6 +19,15 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 헬스 체크 서버 시작 (serve.py로 이미 시작된 경우 무시됨)
+# 프로파일 재생 중에는 감시 스레드가 측정에 끼어들지 않도록 시작하지 않습니다.
+if profiling.PROFILE_MODE != 'replay':
+    health.start_health_server()
+
+# 구간별 프로파일링 (EKS_ASSISTANT_PROFILE=replay일 때만 측정)
+profiling.begin_run()
+profiling.section('init')
+
 # AWS 클라이언트 초기화
 @st.cache_resource
 def init_aws_clients():
@@ -34,11 +47,13 @@ def init_aws_clients():
                 aws_secret_access_key=aws_secret_access_key,
                 region_name=region
             )
+            profiling.attach_aws(session)
         else:
             # IAM Role 기반 자격 증명 시도
             try:
                 # 기본 세션으로 IAM Role 자격 증명 사용
                 session = boto3.Session(region_name=region)
+                profiling.attach_aws(session)
                 
                 # 자격 증명 테스트
                 sts_client = session.client('sts')
@@ -77,6 +92,7 @@ def get_available_models(bedrock_client):
                     'providerName': model['providerName']
                 })
         
+        health.mark_refreshed('models')
         return models
     except ClientError as e:
         st.error(f"Bedrock 모델 조회 중 오류가 발생했습니다: {e}")
@@ -99,38 +115,96 @@ def get_eks_clusters(eks_client):
                 'created_at': cluster_detail['cluster']['createdAt']
             })
         
+        health.mark_refreshed('clusters')
         return clusters
     except ClientError as e:
         st.error(f"EKS 클러스터 조회 중 오류가 발생했습니다: {e}")
         return []
 
 # Bedrock 모델 호출
-def invoke_bedrock_model(bedrock_runtime, model_id, prompt, temperature=0.7, max_tokens=1000, top_p=0.9, top_k=250):
-    """Bedrock 모델을 직접 호출합니다."""
+def invoke_bedrock_model(bedrock_runtime, model_id, prompt, temperature=0.7, max_tokens=1000, top_p=0.9, top_k=250, prompt_type='free_form'):
+    """Bedrock 모델을 직접 호출합니다.
+
+    max_tokens는 상한으로 사용하고, 실제 요청 값은 질문 유형별 응답 길이 이력으로 결정합니다.
+    응답이 max_tokens에서 잘린 경우 상한 내에서 이어서 생성합니다.
+    """
     try:
         if 'anthropic.claude' in model_id:
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                "top_p": top_p,
-                "top_k": top_k,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }
+            policy = generation.plan(prompt_type, max_tokens)
+            messages = [
+                {
+                    "role": "user",
+                    "content": prompt + policy['prompt_suffix']
+                }
+            ]
             
-            response = bedrock_runtime.invoke_model(
-                modelId=model_id,
-                body=json.dumps(body),
-                contentType='application/json'
-            )
+            text = ""
+            tail = ""  # 이어 생성을 위해 잘라낸 끝 공백
+            capped = False
+            calls = []  # 이어 생성을 포함한 호출별 토큰/지연 기록
+            output_tokens = 0
+            budget = policy['max_tokens']
             
-            response_body = json.loads(response['body'].read())
-            return response_body['content'][0]['text']
+            while True:
+                body = {
+                    "anthropic_version": "bedrock-2023-05-31",
+                    "max_tokens": budget,
+                    "temperature": temperature,
+                    "top_p": top_p,
+                    "top_k": top_k,
+                    "messages": messages
+                }
+                
+                started = time.time()
+                try:
+                    with health.track_bedrock_call():
+                        response = bedrock_runtime.invoke_model(
+                            modelId=model_id,
+                            body=json.dumps(body),
+                            contentType='application/json'
+                        )
+                        
+                        response_body = json.loads(response['body'].read())
+                except ClientError as e:
+                    # 첫 호출 실패는 아래에서 오류로 처리하고, 이어 생성이 실패하면 지금까지의 답변을 반환
+                    if not calls:
+                        raise
+                    st.warning(f"답변을 이어서 생성하지 못해 일부만 표시합니다: {e}")
+                    capped = True
+                    break
+                
+                content = response_body.get('content', [])
+                chunk = content[0]['text'] if content else ""
+                # 이어 생성된 답변이 공백으로 시작하지 않으면 잘라낸 줄바꿈/공백을 복원 (Markdown 유지)
+                if tail and not chunk[:1].isspace():
+                    text += tail
+                text += chunk
+                tail = ""
+                usage = response_body.get('usage', {})
+                calls.append({
+                    'max_tokens': budget,
+                    'input_tokens': usage.get('input_tokens', 0),
+                    'output_tokens': usage.get('output_tokens', 0),
+                    'latency': time.time() - started
+                })
+                output_tokens += usage.get('output_tokens', 0)
+                
+                # 잘린 응답은 남은 상한 내에서 지금까지의 답변을 assistant 메시지로 넘겨 이어서 생성
+                budget = max_tokens - output_tokens
+                if response_body.get('stop_reason') != 'max_tokens':
+                    break
+                if len(calls) > generation.MAX_CONTINUATIONS or budget <= 0:
+                    capped = True
+                    break
+                
+                # assistant 메시지는 공백으로 끝날 수 없으므로 끝 공백은 따로 보관
+                stripped = text.rstrip()
+                tail = text[len(stripped):]
+                text = stripped
+                messages = messages[:1] + [{"role": "assistant", "content": text}]
+            
+            generation.record(prompt_type, calls, capped=capped, suffixed=policy['suffixed'])
+            return text.strip()
         else:
             st.error(f"지원되지 않는 모델입니다: {model_id}. Anthropic Claude 모델만 지원됩니다.")
             return None
@@ -141,6 +215,7 @@ def invoke_bedrock_model(bedrock_runtime, model_id, prompt, temperature=0.7, max
 
 # AWS 설정 초기화
 aws_clients = init_aws_clients()
+health.mark_aws_clients(aws_clients)
 
 # 세션 상태 초기화
 if 'chat_history' not in st.session_state:
@@ -153,6 +228,7 @@ if 'current_session_id' not in st.session_state:
     st.session_state.current_session_id = 0
 
 # 사이드바 구성
+profiling.section('sidebar')
 with st.sidebar:
     st.markdown("### EKS 관리 도구")
     
@@ -165,8 +241,10 @@ with st.sidebar:
             # 사용 가능한 모델 목록 조회
             if 'available_models' not in st.session_state:
                 with st.spinner("사용 가능한 모델을 조회하는 중..."):
+                    profiling.section('aws_models')
                     models = get_available_models(aws_clients['bedrock'])
                     st.session_state.available_models = models
+                    profiling.section('sidebar')
             
             models = st.session_state.get('available_models', [])
             
@@ -208,6 +286,8 @@ with st.sidebar:
                 )
                 
                 selected_model_id = model_ids[selected_index]
+                if st.session_state.get('selected_model_id') not in (None, selected_model_id):
+                    profiling.record_event('select', label="사용할 모델 선택", value=selected_index)
                 
                 # 모델 파라미터 설정
                 col1, col2 = st.columns(2)
@@ -237,7 +317,7 @@ with st.sidebar:
                         max_value=4000,
                         value=1000,
                         step=100,
-                        help="최대 응답 길이"
+                        help="최대 응답 길이 (질문 유형별 응답 길이 이력에 따라 이 값 이하로 자동 조정)"
                     )
                     
                     top_k = st.number_input(
@@ -249,6 +329,14 @@ with st.sidebar:
                         help="상위 K개 토큰 선택 (낮을수록 일관성)"
                     )
                 
+                # 프로파일링 기록: 모델 파라미터 변경
+                for label, name, value in (("Temperature", 'temperature', temperature),
+                                           ("Top P", 'top_p', top_p),
+                                           ("Max Tokens", 'max_tokens', max_tokens),
+                                           ("Top K", 'top_k', top_k)):
+                    if st.session_state.get(name) not in (None, value):
+                        profiling.record_event('set', label=label, value=value)
+                
                 # 설정 저장
                 st.session_state.selected_model_id = selected_model_id
                 st.session_state.temperature = temperature
@@ -260,6 +348,7 @@ with st.sidebar:
             else:
                 st.warning("사용 가능한 모델이 없습니다.")
                 if st.button("🔄 모델 목록 새로고침"):
+                    profiling.record_event('click', label="🔄 모델 목록 새로고침")
                     if 'available_models' in st.session_state:
                         del st.session_state.available_models
                     st.rerun()
@@ -270,6 +359,7 @@ with st.sidebar:
     
     # 새 대화 시작 버튼
     if st.button("➕ 새 대화 시작", use_container_width=True):
+        profiling.record_event('click', label="➕ 새 대화 시작")
         # 현재 대화가 있으면 저장
         if len(st.session_state.chat_history) > 0:
             # 첫 번째 사용자 메시지를 제목으로 사용
@@ -383,6 +473,22 @@ with st.sidebar:
             st.write("**저장된 세션 목록:**")
             for session in st.session_state.chat_sessions:
                 st.write(f"  ID: {session['id']}, 제목: {session['title']}, 메시지 수: {len(session['messages'])}")
+        
+        generation_stats = generation.get_stats()
+        if generation_stats:
+            st.write("**질문 유형별 생성 통계:**")
+            for prompt_type, stats in generation_stats.items():
+                st.write(f"  {prompt_type}: 답변 {stats['answers']}회 (이어 생성 {stats['continuations']}회), "
+                         f"평균 입력 {stats['avg_input_tokens']} / 출력 {stats['avg_output_tokens']} / 요청 {stats['avg_max_tokens']} 토큰, "
+                         f"평균 {stats['avg_latency']}초 ({stats['ms_per_output_token']}ms/토큰)")
+                st.write(f"    이어 생성 오버헤드 (고정 Max Tokens 대비 추가 비용): 입력 +{stats['continuation_input_tokens']} 토큰, "
+                         f"답변당 지연 {stats['avg_continuation_latency']:+.2f}초")
+                if stats['suffix_output_delta'] is not None:
+                    suffixed_answers, plain_answers = stats['suffix_samples']
+                    st.write(f"    간결성 지시 효과 (지시 {suffixed_answers}회 vs 대조군 {plain_answers}회, 음수면 절감): "
+                             f"답변당 출력 {stats['suffix_output_delta']:+d} 토큰, 지연 {stats['suffix_latency_delta']:+.2f}초")
+                if stats['capped']:
+                    st.write(f"    잘린 답변 {stats['capped']}회 (한도 도달 또는 이어 생성 실패, 비교에서 제외)")
     
     # 저장된 대화 표시
     if len(st.session_state.chat_sessions) > 0:
@@ -404,6 +510,7 @@ with st.sidebar:
                            key=f"load_{session_key}", 
                            use_container_width=True,
                            help=f"시간: {session['timestamp']}, 메시지: {len(session['messages'])}개"):
+                    profiling.record_event('click', key=f"load_{session_key}")
                     # 선택된 대화로 복원
                     st.session_state.chat_history = session['messages'].copy()
                     st.success(f"✅ '{session['title']}' 대화를 불러왔습니다.")
@@ -413,6 +520,7 @@ with st.sidebar:
                 if st.button("🗑️", 
                            key=f"delete_{session_key}", 
                            help="대화 삭제"):
+                    profiling.record_event('click', key=f"delete_{session_key}")
                     # 해당 세션 삭제
                     st.session_state.chat_sessions = [s for s in st.session_state.chat_sessions if s['id'] != session['id']]
                     st.success("대화가 삭제되었습니다.")
@@ -431,6 +539,7 @@ with st.sidebar:
         if st.button("🗑️ 모든 대화 삭제", 
                     use_container_width=True, 
                     type="secondary"):
+            profiling.record_event('click', label="🗑️ 모든 대화 삭제")
             st.session_state.chat_sessions = []
             st.session_state.current_session_id = 0
             st.success("모든 대화가 삭제되었습니다.")
@@ -440,6 +549,7 @@ with st.sidebar:
         st.caption("질문을 하고 '➕ 새 대화 시작' 버튼을 눌러 대화를 저장하세요.")
 
 # 메인 콘텐츠 영역
+profiling.section('header')
 st.markdown("""
 <div style="text-align: center; margin: 2rem 0;">
     <h1>☁️ AWS EKS 클러스터 관리 어시스턴트</h1>
@@ -448,6 +558,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # AWS 연결 상태 확인
+profiling.section('cluster_status')
 if aws_clients:
     st.success("✅ AWS 서비스에 연결되었습니다.")
     
@@ -455,10 +566,13 @@ if aws_clients:
     st.markdown("### 📊 EKS 클러스터 상태")
     
     if st.button("🔄 클러스터 목록 새로고침"):
+        profiling.record_event('click', label="🔄 클러스터 목록 새로고침")
         st.cache_resource.clear()
     
     # EKS 클러스터 목록 조회
+    profiling.section('aws_clusters')
     clusters = get_eks_clusters(aws_clients['eks'])
+    profiling.section('cluster_status')
     
     if clusters:
         col1, col2 = st.columns([3, 1])
@@ -472,11 +586,14 @@ if aws_clients:
             )
             
             if selected_cluster_name:
+                if st.session_state.selected_cluster and st.session_state.selected_cluster['name'] != selected_cluster_name:
+                    profiling.record_event('select', label="클러스터 선택", value=selected_cluster_name)
                 selected_cluster = next(c for c in clusters if c['name'] == selected_cluster_name)
                 st.session_state.selected_cluster = selected_cluster
         
         with col2:
             if st.button("클러스터 세부 정보", type="primary"):
+                profiling.record_event('click', label="클러스터 세부 정보")
                 if st.session_state.selected_cluster:
                     cluster = st.session_state.selected_cluster
                     st.info(f"""
@@ -503,6 +620,7 @@ else:
     st.error("❌ AWS 서비스 연결에 실패했습니다. 자격 증명을 확인해주세요.")
 
 # 채팅 기록 표시
+profiling.section('chat_history')
 if st.session_state.chat_history:
     st.markdown("### 💬 대화 기록")
     
@@ -528,12 +646,14 @@ if st.session_state.chat_history:
                 """, unsafe_allow_html=True)
 
 # 기능 카드들
+profiling.section('feature_cards')
 st.markdown("### 주요 기능")
 
 col1, col2 = st.columns(2)
 
 with col1:
     if st.button("☁️ How do I create an EKS cluster?", use_container_width=True):
+        profiling.record_event('click', label="☁️ How do I create an EKS cluster?")
         if aws_clients and st.session_state.get('selected_model_id'):
             with st.spinner("Bedrock 모델에서 응답을 가져오는 중..."):
                 response = invoke_bedrock_model(
@@ -543,7 +663,8 @@ with col1:
                     st.session_state.get('temperature', 0.7),
                     st.session_state.get('max_tokens', 1000),
                     st.session_state.get('top_p', 0.9),
-                    st.session_state.get('top_k', 250)
+                    st.session_state.get('top_k', 250),
+                    prompt_type='create_cluster'
                 )
                 if response:
                     st.session_state.chat_history.append(("user", "How do I create an EKS cluster?"))
@@ -551,6 +672,7 @@ with col1:
                     st.rerun()
     
     if st.button("🔧 Common kubectl commands for EKS", use_container_width=True):
+        profiling.record_event('click', label="🔧 Common kubectl commands for EKS")
         if aws_clients and st.session_state.get('selected_model_id'):
             with st.spinner("Bedrock 모델에서 응답을 가져오는 중..."):
                 response = invoke_bedrock_model(
@@ -560,7 +682,8 @@ with col1:
                     st.session_state.get('temperature', 0.7),
                     st.session_state.get('max_tokens', 1000),
                     st.session_state.get('top_p', 0.9),
-                    st.session_state.get('top_k', 250)
+                    st.session_state.get('top_k', 250),
+                    prompt_type='kubectl_commands'
                 )
                 if response:
                     st.session_state.chat_history.append(("user", "Common kubectl commands for EKS"))
@@ -569,6 +692,7 @@ with col1:
 
 with col2:
     if st.button("📊 Show me my EKS clusters", use_container_width=True):
+        profiling.record_event('click', label="📊 Show me my EKS clusters")
         if clusters:
             cluster_info = "\n".join([f"- {c['name']} (상태: {c['status']}, 버전: {c['version']})" for c in clusters])
             st.session_state.chat_history.append(("user", "Show me my EKS clusters"))
@@ -576,6 +700,7 @@ with col2:
             st.rerun()
     
     if st.button("📈 How do I scale my EKS deployment?", use_container_width=True):
+        profiling.record_event('click', label="📈 How do I scale my EKS deployment?")
         if aws_clients and st.session_state.get('selected_model_id'):
             with st.spinner("Bedrock 모델에서 응답을 가져오는 중..."):
                 response = invoke_bedrock_model(
@@ -585,7 +710,8 @@ with col2:
                     st.session_state.get('temperature', 0.7),
                     st.session_state.get('max_tokens', 1000),
                     st.session_state.get('top_p', 0.9),
-                    st.session_state.get('top_k', 250)
+                    st.session_state.get('top_k', 250),
+                    prompt_type='scale_deployment'
                 )
                 if response:
                     st.session_state.chat_history.append(("user", "How do I scale my EKS deployment?"))
@@ -594,6 +720,7 @@ with col2:
 
 # 추가 기능 카드
 if st.button("💾 How to connect RDS to my EKS cluster?", use_container_width=True):
+    profiling.record_event('click', label="💾 How to connect RDS to my EKS cluster?")
     if aws_clients and st.session_state.get('selected_model_id'):
         with st.spinner("Bedrock 모델에서 응답을 가져오는 중..."):
             response = invoke_bedrock_model(
@@ -603,7 +730,8 @@ if st.button("💾 How to connect RDS to my EKS cluster?", use_container_width=T
                 st.session_state.get('temperature', 0.7),
                 st.session_state.get('max_tokens', 1000),
                 st.session_state.get('top_p', 0.9),
-                st.session_state.get('top_k', 250)
+                st.session_state.get('top_k', 250),
+                prompt_type='connect_rds'
             )
             if response:
                 st.session_state.chat_history.append(("user", "How to connect RDS to my EKS cluster?"))
@@ -611,6 +739,7 @@ if st.button("💾 How to connect RDS to my EKS cluster?", use_container_width=T
                 st.rerun()
 
 # 하단 입력 영역
+profiling.section('chat_input')
 st.markdown("---")
 
 # 채팅 입력 폼 생성 (엔터키로 전송 가능)
@@ -631,6 +760,8 @@ with st.form(key='chat_form', clear_on_submit=True):
         submitted = st.form_submit_button("📤", help="전송 (또는 엔터키)")
 
 # 폼이 제출되었을 때 처리
+if submitted:
+    profiling.record_event('submit', key="main_input", value=user_input)
 if submitted and user_input:
     if aws_clients and st.session_state.get('selected_model_id'):
         with st.spinner("Bedrock 모델에서 응답을 가져오는 중..."):
@@ -663,6 +794,7 @@ elif submitted and not user_input:
     st.warning("질문을 입력해주세요.")
 
 # CSS 스타일링
+profiling.section('styles')
 st.markdown("""
 <style>
     .stApp {
@@ -713,3 +845,5 @@ st.markdown("""
     }
 </style>
 """, unsafe_allow_html=True)
+
+profiling.section(None)
@@ -0,0 +1,271 @@
+"""기록된 세션을 AppTest로 재생하며 main.py의 구간별 비용을 측정합니다.
+
+1. 기록: EKS_ASSISTANT_PROFILE=record streamlit run main.py
+   (상호작용, 모델 파라미터 변경, AWS 응답이 .profiles/session-<id>.jsonl에 저장됨)
+2. 재생: python profile_replay.py .profiles/session-<id>.jsonl --label v1.2.0
+
+재생 시 boto3 클라이언트는 기록된 AWS 응답을 돌려주도록 대체되므로 네트워크 호출이나 비용이 발생하지 않고,
+실행마다 달라지는 네트워크 지연 없이 재실행 경로만 측정됩니다. 기록에 없는 호출은 ClientError로 처리되고
+report.json의 aws_unmatched_calls에 남습니다.
+--live-aws를 주면 실제 AWS를 호출합니다. 이때 기록된 프리셋 질문과 채팅 입력마다 Bedrock invoke_model이
+다시 호출되어 비용이 청구되고(패스마다 반복), EKS/Bedrock 조회 시간이 네트워크 상태에 따라 달라집니다.
+
+기록은 세 번 재생됩니다. 구간별 시간(wall_ms)은 계측 없이 perf_counter만 사용하는 첫 패스에서만 측정하고,
+cProfile과 tracemalloc은 시간을 크게 왜곡하므로 각각 별도 패스에서 실행합니다(--no-cprofile, --no-memory로 생략 가능).
+
+결과 디렉터리에는 report.json(구간별 시간/메모리), stacks.folded(flamegraph.pl, speedscope 등에서
+사용 가능한 folded stack), <구간>.prof(snakeviz 등에서 열 수 있는 cProfile 통계)가 저장됩니다.
+재생에는 AppTest가 포함된 streamlit이 필요하므로 requirements-dev.txt(streamlit 1.66.0)로 별도 환경을 만들어
+실행합니다 (pip install -r requirements-dev.txt). 배포 버전(requirements.txt의 1.27.2)에는 AppTest가 없고,
+1.28의 AppTest는 st.rerun() 뒤에도 버튼 클릭을 다시 전달해 기록보다 많은 호출이 발생합니다.
+기록은 배포 버전에서 하지만 재생 측정값은 재생에 사용한 streamlit 버전(report.json의 streamlit_version)의
+재실행 비용이므로, 릴리스 간 비교는 같은 재생 환경에서 한 결과끼리만 해야 합니다.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# profiling 모듈이 로드되기 전에 재생 모드를 설정해야 합니다.
+os.environ['EKS_ASSISTANT_PROFILE'] = 'replay'
+
+# 재생을 검증한 streamlit 버전 (requirements-dev.txt와 맞춰 둡니다)
+REPLAY_STREAMLIT_VERSION = '1.66.0'
+
+import streamlit  # noqa: E402
+
+try:
+    from streamlit.testing.v1 import AppTest  # noqa: E402
+except ImportError:
+    sys.exit(f"streamlit {streamlit.__version__}에는 AppTest가 없습니다. 재생에는 streamlit {REPLAY_STREAMLIT_VERSION}이 "
+             f"필요합니다: pip install -r requirements-dev.txt")
+
+import profiling  # noqa: E402
+
+
+def load_events(path):
+    """기록 파일에서 상호작용 목록과 AWS 응답 목록을 읽습니다."""
+    with open(path, encoding='utf-8') as f:
+        records = [profiling.decode_event(line) for line in f if line.strip()]
+    events = [record for record in records if record['action'] != 'aws']
+    aws_responses = [record for record in records if record['action'] == 'aws']
+    return events, aws_responses
+
+
+def deployed_streamlit_version():
+    """requirements.txt에 고정된 배포용 streamlit 버전을 반환합니다."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'requirements.txt')
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip().startswith('streamlit=='):
+                    return line.strip().split('==', 1)[1]
+    except OSError:
+        pass
+    return None
+
+
+def find_widget(widgets, label):
+    return next((widget for widget in widgets if widget.label == label), None)
+
+
+def pin_index_selectboxes(at):
+    """format_func로 인덱스를 표시 이름으로 바꾸는 selectbox(모델 선택)의 값을 표시 이름으로 고정합니다.
+
+    AppTest는 selectbox 상태를 표시 이름 목록에서 str(value)로 찾기 때문에, 인덱스 값을 그대로 두면
+    위젯 상태를 만들 때 실패합니다.
+    """
+    for widget in at.selectbox:
+        value = widget.value
+        if isinstance(value, int) and str(value) not in widget.options and 0 <= value < len(widget.options):
+            widget.select_index(value)
+
+
+def apply_event(at, event):
+    """기록된 상호작용을 AppTest에 적용합니다. 적용할 위젯이 없으면 False를 반환합니다."""
+    action = event['action']
+    if action == 'click':
+        if event.get('key'):
+            widget = next((b for b in at.button if b.key == event['key']), None)
+        else:
+            widget = find_widget(at.button, event['label'])
+        if widget is None:
+            return False
+        widget.click()
+    elif action == 'select':
+        widget = find_widget(at.selectbox, event['label'])
+        if widget is None:
+            return False
+        if isinstance(event['value'], int) and str(event['value']) not in widget.options:
+            widget.select_index(event['value'])
+        else:
+            widget.set_value(event['value'])
+    elif action == 'set':
+        widget = find_widget(list(at.slider) + list(at.number_input), event['label'])
+        if widget is None:
+            return False
+        widget.set_value(event['value'])
+    elif action == 'submit':
+        submit_button = find_widget(at.button, "📤")
+        if submit_button is None:
+            return False
+        at.text_input(key=event['key']).input(event['value'] or "")
+        submit_button.click()
+    else:
+        return False
+    return True
+
+
+def summarize(runs):
+    """구간별 실행 횟수와 평균/최대 시간 또는 평균 할당량/최대 피크 메모리를 집계합니다."""
+    collected = {}
+    for run in runs:
+        for name, measured in run['sections'].items():
+            section = collected.setdefault(name, {'runs': 0})
+            section['runs'] += 1
+            for metric, value in measured.items():
+                section.setdefault(metric, []).append(value)
+
+    summary = {}
+    for name, section in collected.items():
+        result = {'runs': section['runs']}
+        if 'wall_ms' in section:
+            result['total_wall_ms'] = round(sum(section['wall_ms']), 3)
+            result['mean_wall_ms'] = round(sum(section['wall_ms']) / len(section['wall_ms']), 3)
+            result['max_wall_ms'] = max(section['wall_ms'])
+        if 'alloc_bytes' in section:
+            result['mean_alloc_bytes'] = round(sum(section['alloc_bytes']) / len(section['alloc_bytes']))
+            result['max_peak_bytes'] = max(section['peak_bytes'])
+        summary[name] = result
+    return summary
+
+
+def replay(script, events, aws_responses, timeout, instrument=None):
+    """기록된 상호작용을 한 번 재생하고 재실행별 측정 결과를 반환합니다."""
+    profiling.load_aws_responses(aws_responses)
+    # 이전 패스의 캐시가 남아 있으면 init 구간이 패스마다 달라지므로 비웁니다.
+    streamlit.cache_resource.clear()
+    streamlit.cache_data.clear()
+    profiling.reset()
+    profiling.set_instrumentation(instrument)
+    if instrument == 'memory':
+        tracemalloc.start()
+
+    at = AppTest.from_file(script, default_timeout=timeout)
+    runs = []
+    skipped = 0
+    for event in [None] + events:
+        pin_index_selectboxes(at)
+        if event is not None and not apply_event(at, event):
+            print(f"건너뜀 (위젯을 찾을 수 없음): {event}")
+            skipped += 1
+            continue
+        before = len(profiling.get_runs())
+        at.run()
+        # st.rerun()이 호출되면 하나의 상호작용에서 여러 번 재실행될 수 있습니다.
+        for run in profiling.get_runs()[before:]:
+            runs.append({'event': event, 'sections': run['sections']})
+
+    if instrument == 'memory':
+        tracemalloc.stop()
+    stats = profiling.get_stats()
+    profiling.set_instrumentation(None)
+    return runs, skipped, stats, profiling.get_aws_misses()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="기록된 세션을 재생하며 main.py 구간별 프로파일을 생성합니다.")
+    parser.add_argument('recording', help="EKS_ASSISTANT_PROFILE=record로 저장된 세션 기록 파일")
+    parser.add_argument('--script', default='main.py', help="재생할 Streamlit 스크립트")
+    parser.add_argument('--out', default=None, help="결과 디렉터리 (기본값: .profiles/replay-<시각>)")
+    parser.add_argument('--label', default='', help="릴리스 비교를 위해 보고서에 남길 이름 (예: 버전, 커밋)")
+    parser.add_argument('--timeout', type=float, default=60, help="재실행 한 번의 최대 대기 시간(초)")
+    parser.add_argument('--no-cprofile', action='store_true', help="cProfile 패스 생략")
+    parser.add_argument('--no-memory', action='store_true', help="tracemalloc 패스 생략")
+    parser.add_argument('--live-aws', action='store_true',
+                        help="기록된 응답 대신 실제 AWS 호출 (Bedrock 호출 비용 발생, 네트워크 지연 포함)")
+    args = parser.parse_args()
+
+    if streamlit.__version__ != REPLAY_STREAMLIT_VERSION:
+        print(f"주의: 재생을 검증한 streamlit은 {REPLAY_STREAMLIT_VERSION}입니다 (현재 {streamlit.__version__}).")
+
+    if args.live_aws:
+        os.environ['EKS_ASSISTANT_PROFILE_LIVE_AWS'] = '1'
+        profiling.PROFILE_LIVE_AWS = True
+        print("주의: 실제 AWS를 호출합니다. Bedrock 호출 비용이 발생하고 측정값에 네트워크 지연이 포함됩니다.")
+
+    events, aws_responses = load_events(args.recording)
+    if not args.live_aws:
+        # 대체된 호출은 서명하지 않으므로 자격 증명 값은 쓰이지 않고, main.py의 초기화 경로만 결정합니다.
+        # IAM Role 경로는 sts.GetCallerIdentity를 호출하므로 기록에 그 응답이 있으면 같은 경로로 재생합니다.
+        if any(response['key'] == 'sts.GetCallerIdentity' for response in aws_responses):
+            os.environ.pop('AWS_ACCESS_KEY_ID', None)
+            os.environ.pop('AWS_SECRET_ACCESS_KEY', None)
+        else:
+            os.environ.setdefault('AWS_ACCESS_KEY_ID', 'replay')
+            os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'replay')
+    out_dir = args.out or os.path.join(profiling.PROFILE_DIR, f"replay-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    runs, skipped, _, aws_misses = replay(args.script, events, aws_responses, args.timeout)
+    summary = summarize(runs)
+
+    memory_runs = []
+    if not args.no_memory:
+        memory_runs, _, _, _ = replay(args.script, events, aws_responses, args.timeout, instrument='memory')
+        for name, section in summarize(memory_runs).items():
+            summary.setdefault(name, {'runs': section['runs']}).update(
+                mean_alloc_bytes=section['mean_alloc_bytes'],
+                max_peak_bytes=section['max_peak_bytes'],
+            )
+
+    folded = []
+    if not args.no_cprofile:
+        _, _, stats, _ = replay(args.script, events, aws_responses, args.timeout, instrument='cprofile')
+        for name, section_stats in stats.items():
+            section_stats.dump_stats(os.path.join(out_dir, f"{name}.prof"))
+            folded.extend(profiling.folded_stacks(name, section_stats))
+        with open(os.path.join(out_dir, 'stacks.folded'), 'w', encoding='utf-8') as f:
+            f.write("\n".join(folded) + "\n")
+    elapsed = time.perf_counter() - started
+
+    report = {
+        'label': args.label,
+        'created_at': datetime.now().isoformat(),
+        'streamlit_version': streamlit.__version__,
+        # 측정값은 배포 버전이 아니라 위 재생용 streamlit에서의 재실행 비용입니다.
+        'deployed_streamlit_version': deployed_streamlit_version(),
+        'recording': args.recording,
+        'events': len(events),
+        'skipped_events': skipped,
+        'live_aws': args.live_aws,
+        'aws_recorded_calls': len(aws_responses),
+        'aws_unmatched_calls': aws_misses,
+        'reruns': len(runs),
+        'elapsed_seconds': round(elapsed, 3),
+        'passes': ['timing'] + ([] if args.no_memory else ['memory']) + ([] if args.no_cprofile else ['cprofile']),
+        'sections': summary,
+        'runs': runs,
+        'memory_runs': memory_runs,
+    }
+    with open(os.path.join(out_dir, 'report.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+    print(f"{'구간':<16}{'실행':>6}{'평균(ms)':>12}{'최대(ms)':>12}{'평균 할당(KB)':>16}{'최대 피크(KB)':>16}")
+    for name, section in sorted(summary.items(), key=lambda item: -item[1].get('total_wall_ms', 0)):
+        alloc = f"{section['mean_alloc_bytes'] / 1024:.1f}" if 'mean_alloc_bytes' in section else "-"
+        peak = f"{section['max_peak_bytes'] / 1024:.1f}" if 'max_peak_bytes' in section else "-"
+        print(f"{name:<16}{section['runs']:>6}{section.get('mean_wall_ms', 0):>12.2f}{section.get('max_wall_ms', 0):>12.2f}"
+              f"{alloc:>16}{peak:>16}")
+    if aws_misses:
+        print(f"\n경고: 기록된 응답이 없는 AWS 호출 {len(aws_misses)}건 (기록과 다른 경로가 측정됨): {sorted(set(aws_misses))}")
+    print(f"\n재실행 {len(runs)}회, {elapsed:.2f}초 - 결과: {out_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+# 프로파일링 모드 (기본값은 비활성화)
+#   record: 세션의 사용자 상호작용과 AWS 응답을 PROFILE_DIR에 기록
+#   replay: profile_replay.py가 재생할 때 구간별 측정
+#     (시간은 계측 없는 패스에서만, cProfile/tracemalloc은 각각 별도 패스에서 측정)
+PROFILE_MODE = os.getenv('EKS_ASSISTANT_PROFILE', '')
+PROFILE_DIR = os.getenv('EKS_ASSISTANT_PROFILE_DIR', '.profiles')
+# replay에서 기록된 응답 대신 실제 AWS를 호출할지 여부 (Bedrock 호출 비용이 발생함)
+PROFILE_LIVE_AWS = os.getenv('EKS_ASSISTANT_PROFILE_LIVE_AWS', '') == '1'
+
+_lock = threading.Lock()
+_runs = []  # 재실행별 구간 측정 결과
+_stats = {}  # 구간별 누적 cProfile 통계
+_current = None  # 현재 측정 중인 구간
+_aws_responses = {}  # replay: 'service.Operation'별로 기록된 응답 큐
+_aws_misses = []  # replay: 기록된 응답이 없어 실패로 처리한 호출
+_instrument = None  # None: 시간만 측정, 'cprofile' 또는 'memory': 해당 계측만 수행 (시간은 기록하지 않음)
+
+
+def set_instrumentation(instrument=None):
+    """재생 패스의 계측 종류를 설정합니다. 계측 패스의 시간은 왜곡되므로 기록하지 않습니다."""
+    global _instrument
+    _close_section()
+    _instrument = instrument
+
+
+def _close_section():
+    global _current
+    if _current is None:
+        return
+    wall = time.perf_counter() - _current['started']
+    profiler = _current['profiler']
+    if profiler is not None:
+        profiler.disable()
+
+    with _lock:
+        # 같은 구간이 한 실행에서 여러 번 나뉘어 측정되면 합산
+        measured = _runs[-1]['sections'].setdefault(_current['name'], {})
+        if _current['instrument'] is None:
+            measured['wall_ms'] = round(measured.get('wall_ms', 0.0) + wall * 1000, 3)
+        elif _current['instrument'] == 'memory':
+            current, peak_now = tracemalloc.get_traced_memory()
+            measured['alloc_bytes'] = measured.get('alloc_bytes', 0) + current - _current['memory']
+            measured['peak_bytes'] = max(measured.get('peak_bytes', 0), peak_now - _current['memory'])
+        elif _current['name'] in _stats:
+            _stats[_current['name']].add(profiler)
+        else:
+            _stats[_current['name']] = pstats.Stats(profiler)
+    _current = None
+
+
+def begin_run():
+    """스크립트 재실행 시작을 표시합니다.
+
+    st.rerun()으로 이전 실행이 중간에 끝난 경우 열려 있던 구간도 여기서 닫습니다.
+    """
+    if PROFILE_MODE != 'replay':
+        return
+    _close_section()
+    with _lock:
+        _runs.append({'sections': {}})
+
+
+def section(name):
+    """이전 구간을 닫고 새 구간의 측정을 시작합니다. name이 None이면 구간만 닫습니다."""
+    global _current
+    if PROFILE_MODE != 'replay':
+        return
+    _close_section()
+    if name is None:
+        return
+
+    memory = 0
+    if _instrument == 'memory':
+        # tracemalloc 시작/종료는 profile_replay.py가 메모리 패스에서만 수행합니다.
+        tracemalloc.reset_peak()
+        memory = tracemalloc.get_traced_memory()[0]
+
+    profiler = cProfile.Profile() if _instrument == 'cprofile' else None
+    _current = {
+        'name': name,
+        'instrument': _instrument,
+        'memory': memory,
+        'profiler': profiler,
+        'started': time.perf_counter(),
+    }
+    if profiler is not None:
+        profiler.enable()
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    return str(value)
+
+
+def decode_event(line):
+    """기록 파일의 한 줄을 읽어 datetime 값까지 복원합니다."""
+    def hook(obj):
+        if set(obj) == {'__datetime__'}:
+            return datetime.fromisoformat(obj['__datetime__'])
+        return obj
+    return json.loads(line, object_hook=hook)
+
+
+def _operation_key(model):
+    return f"{model.service_model.service_name}.{model.name}"
+
+
+def _capture_aws_response(http_response, parsed, model, **kwargs):
+    # 스트리밍 본문(invoke_model)은 한 번만 읽을 수 있으므로 읽은 뒤 같은 내용으로 다시 채워 넣습니다.
+    from botocore.response import StreamingBody
+
+    body = None
+    if hasattr(parsed.get('body'), 'read'):
+        data = parsed['body'].read()
+        parsed['body'] = StreamingBody(io.BytesIO(data), len(data))
+        body = data.decode('utf-8')
+    record_event('aws', key=_operation_key(model), value={
+        'status': http_response.status_code,
+        'parsed': {name: value for name, value in parsed.items() if name != 'body'},
+        'body': body,
+    })
+
+
+def _replay_aws_response(model, **kwargs):
+    # before-call에서 응답을 반환하면 botocore는 실제 요청을 보내지 않습니다.
+    from botocore.awsrequest import AWSResponse
+    from botocore.response import StreamingBody
+
+    key = _operation_key(model)
+    with _lock:
+        queue = _aws_responses.get(key)
+        recorded = queue.popleft() if queue else None
+        if recorded is None:
+            _aws_misses.append(key)
+    if recorded is None:
+        return AWSResponse(None, 400, {}, None), {
+            'Error': {'Code': 'ReplayMissingResponse', 'Message': f"기록된 응답이 없습니다: {key}"},
+        }
+
+    parsed = dict(recorded['parsed'])
+    if recorded['body'] is not None:
+        data = recorded['body'].encode('utf-8')
+        parsed['body'] = StreamingBody(io.BytesIO(data), len(data))
+    return AWSResponse(None, recorded['status'], {}, None), parsed
+
+
+def attach_aws(session):
+    """boto3 세션에 프로파일링 훅을 연결합니다.
+
+    record 모드에서는 모든 AWS 응답을 기록하고, replay 모드에서는 기록된 응답으로 AWS 호출을 대체합니다
+    (EKS_ASSISTANT_PROFILE_LIVE_AWS=1이면 실제 AWS를 호출). 세션에서 클라이언트를 만들기 전에 호출해야 합니다.
+    """
+    if PROFILE_MODE == 'record':
+        session.events.register('after-call', _capture_aws_response)
+    elif PROFILE_MODE == 'replay' and not PROFILE_LIVE_AWS:
+        session.events.register('before-call', _replay_aws_response)
+
+
+def load_aws_responses(events):
+    """재생에 사용할 AWS 응답을 기록 순서대로 불러옵니다."""
+    with _lock:
+        _aws_responses.clear()
+        _aws_misses.clear()
+        for event in events:
+            _aws_responses.setdefault(event['key'], deque()).append(event['value'])
+
+
+def get_aws_misses():
+    """기록된 응답이 없어 실패로 처리된 AWS 호출 목록을 반환합니다."""
+    with _lock:
+        return list(_aws_misses)
+
+
+def record_event(action, label=None, key=None, value=None):
+    """사용자 상호작용을 세션별 기록 파일에 추가합니다."""
+    if PROFILE_MODE != 'record':
+        return
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    session_id = ctx.session_id if ctx else 'unknown'
+    event = {'action': action, 'label': label, 'key': key, 'value': value}
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with _lock, open(os.path.join(PROFILE_DIR, f"session-{session_id}.jsonl"), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(event, ensure_ascii=False, default=_encode) + "\n")
+
+
+def get_runs():
+    """재실행별 구간 측정 결과를 반환합니다."""
+    _close_section()
+    with _lock:
+        return [{'sections': {name: dict(m) for name, m in run['sections'].items()}} for run in _runs]
+
+
+def get_stats():
+    """구간별 누적 cProfile 통계(pstats.Stats)를 반환합니다."""
+    _close_section()
+    with _lock:
+        return dict(_stats)
+
+
+def reset():
+    """측정 결과를 초기화합니다."""
+    _close_section()
+    with _lock:
+        _runs.clear()
+        _stats.clear()
+
+
+def folded_stacks(section_name, stats, max_depth=64):
+    """pstats 통계를 flamegraph.pl / speedscope용 folded stack 형식으로 변환합니다.
+
+    cProfile은 호출자별 시간(callers[c] = (cc, nc, tt, ct))만 남기므로, 함수 자체 시간을 호출자별 자체 시간
+    비율로 나누고, 각 호출자에서는 다시 그 호출자의 호출자별 누적 시간 비율로 나눠 올라가며 스택을 만듭니다.
+    profiling.py와 cProfile 자체의 프레임은 제외합니다. 값은 마이크로초입니다.
+    """
+    entries = stats.stats
+
+    def hidden(func):
+        filename, _, name = func
+        return os.path.basename(filename) == 'profiling.py' or '_lsprof' in name
+
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})".replace(" ", "_").replace(";", ":")
+
+    def caller_shares(func, stack, index):
+        callers = {
+            caller: timing[index] if isinstance(timing, tuple) else timing
+            for caller, timing in entries[func][4].items()
+            if caller in entries and not hidden(caller) and caller not in stack
+        }
+        total = sum(callers.values())
+        if total <= 0:
+            return []
+        return [(caller, value / total) for caller, value in callers.items() if value > 0]
+
+    folded = {}
+
+    def walk(stack, weight):
+        # 잎 함수는 호출자별 자체 시간(tt), 그 위로는 호출자별 누적 시간(ct) 비율로 나눕니다.
+        shares = caller_shares(stack[-1], stack, 2 if len(stack) == 1 else 3)
+        if not shares or len(stack) >= max_depth:
+            key = ";".join([section_name] + [label(func) for func in reversed(stack)])
+            folded[key] = folded.get(key, 0) + weight
+            return
+        for caller, share in shares:
+            if weight * share >= 1:
+                walk(stack + [caller], weight * share)
+
+    for func, (_, _, tottime, _, _) in entries.items():
+        if hidden(func) or tottime <= 0:
+            continue
+        walk([func], tottime * 1_000_000)
+
+    return [f"{stack} {round(weight)}" for stack, weight in folded.items() if round(weight) > 0]
@@ -0,0 +1,14 @@
+import sys
+
+from streamlit.web import cli as stcli
+
+import health
+
+# Streamlit은 첫 세션이 연결되기 전까지 main.py를 실행하지 않으므로,
+# 프로브가 바로 응답할 수 있도록 헬스 체크 서버를 먼저 띄운 뒤 Streamlit을 실행합니다.
+# readiness는 Streamlit 서버가 /_stcore/health에 응답한 뒤에야 통과합니다.
+# 사용법: python serve.py run main.py --server.port=8501 ...
+if __name__ == '__main__':
+    health.start_health_server()
+    sys.argv = ['streamlit'] + sys.argv[1:]
+    sys.exit(stcli.main())